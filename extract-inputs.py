@@ -6,23 +6,461 @@ Usage:
     python extract-inputs.py --single <file.nb>          # Single file, JSON to stdout
     python extract-inputs.py --batch <directory>          # Batch mode, JSON to stdout
     python extract-inputs.py <input_dir> <output_dir>    # Directory mode (files to disk)
+    python extract-inputs.py --dedupe <input_dir> <output_dir>
+                                    # Directory mode, each distinct input stored once
+    python extract-inputs.py --workers <n> <input_dir> <output_dir>
+                                    # Directory mode with n Wolfram sessions
+    python extract-inputs.py --serve                      # Keep a session for --single
 
 Requirements:
     pip install wolframclient
     Wolfram Engine or Mathematica must be installed
+    Optional: pip install orjson  (faster JSON output)
 """
 
 import argparse
+import asyncio
+import hashlib
+import hmac
+import itertools
 import json
+import mmap
+import multiprocessing
+import multiprocessing.util
+import os
+import secrets
+import signal
+import socket
+import socketserver
 import sys
 from pathlib import Path
+from wolframclient.deserializers import binary_deserialize
 from wolframclient.evaluation import WolframLanguageSession
+from wolframclient.language import wl, wlexpr
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Number of notebooks sent to the kernel per evaluation
+BATCH_SIZE = 16
+
+# Wolfram Language definition of extractInputs[path, mtime], evaluated once
+# per session so later calls only send the function name and arguments.
+# The latest result for each path is kept in extractInputsCache together with
+# the modification time it was computed for, so asking again for an unchanged
+# notebook in the same session returns immediately. A newer modification time
+# replaces the entry, and failed imports are not kept.
+# extractInputsFromFile:
+# 1. Imports the notebook
+# 2. Extracts input cells
+# 3. Filters out Null and Image inputs
+# 4. Converts them to pretty-formatted InputForm strings
+# 5. Returns a list of strings, or $Failed if the notebook cannot be imported
+EXTRACT_INPUTS_DEFINITION = '''
+extractInputsCache = <||>;
+
+extractInputs[path_String, mtime_Integer] := Module[{cached, result},
+    cached = Lookup[extractInputsCache, path, None];
+    If[MatchQ[cached, {mtime, _}], Return[Last[cached], Module]];
+    
+    result = extractInputsFromFile[path];
+    If[result === $Failed,
+        KeyDropFrom[extractInputsCache, path];
+        {},
+        extractInputsCache[path] = {mtime, result};
+        result
+    ]
+];
+
+extractInputsFromFile[path_String] := Module[{nb, cells, parsed, mask, filtered},
+    nb = Import[path, "NB"];
+    If[nb === $Failed, Return[$Failed, Module]];
+    
+    cells = Cases[nb, Cell[content_, "Input", ___] :> content, Infinity];
+    
+    (* Drop Null cells and cells that mention Image using the raw boxes,
+       so they are never parsed *)
+    cells = Select[cells,
+        !MatchQ[#, "Null" | BoxData["Null" | RowBox[{"Null"}]]] &&
+        FreeQ[#, "Image"] &
+    ];
+    
+    (* Parse each remaining cell once; the held expression is used for
+       both filtering and formatting *)
+    parsed = Map[ToExpression[#, StandardForm, HoldForm] &, cells];
+    
+    (* Filter out Null and Image that only show up once parsed, e.g.
+       images pasted in as graphics boxes. The mask is built in one Map
+       and applied with Pick. *)
+    mask = Map[!MatchQ[#, HoldForm[Null]] && FreeQ[#, Image] &, parsed];
+    filtered = Pick[parsed, mask];
+    
+    (* Convert remaining cells to pretty-formatted InputForm strings *)
+    (* Use ToString with PageWidth option for line breaks and indentation *)
+    Map[ToString[#, InputForm, PageWidth -> 80] &, filtered]
+]
+'''
+
+# Style literal present in a notebook file for every Input cell
+INPUT_STYLE_MARKER = b'"Input"'
+
+# Line between inputs in the text files written by directory mode
+SEPARATOR = '-' * 70
+
+# Address of the --serve server that --single tries before starting a session.
+# The server only listens on the loopback interface.
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 48620
+
+# Line the server sends as soon as it takes a connection, so --single can
+# tell it is talking to an idle extraction server
+SERVER_GREETING = b"nbdiff-extract 1\n"
+
+# Seconds --single waits for the server to accept a connection and greet it.
+# A server busy with another request does not greet in time, and --single
+# starts its own session instead of queueing.
+SERVER_CONNECT_TIMEOUT = 0.5
+
+# Seconds --single waits for the server to answer a request
+SERVER_RESPONSE_TIMEOUT = 300
+
+# Seconds the server waits for a client to send its request line, so a
+# silent client cannot hold up the single-threaded server
+SERVER_REQUEST_TIMEOUT = 5
+
+# Extraction results are cached in this subdirectory of the output directory,
+# keyed by notebook contents
+CACHE_DIR_NAME = ".cache"
+
+# With --dedupe, inputs are stored once each in this subdirectory of the
+# output directory, as <sha256[:2]>/<sha256[2:]>.txt
+OBJECTS_DIR_NAME = "objects"
+
+# Bytes read at a time when hashing a notebook for its cache key
+HASH_CHUNK_SIZE = 1 << 20
+
+# Salt for cache keys; changes whenever the extraction code changes
+CACHE_SALT = hashlib.blake2b(EXTRACT_INPUTS_DEFINITION.encode('utf-8'),
+                             digest_size=16).digest()
+
+# Launch parallel subkernels and share extractInputs with them. Quiet keeps
+# a missing subkernel license from producing messages; in that case
+# $KernelCount stays 0 and extractInputsList falls back to Map.
+PARALLEL_SETUP = '''
+Quiet[LaunchKernels[]];
+(* Also distributes extractInputsFromFile and extractInputsCache, which
+   extractInputs depends on *)
+If[$KernelCount > 0, DistributeDefinitions[extractInputs]];
+'''
+
+# Apply extractInputs to a list of {path, mtime} pairs, on subkernels when
+# available
+EXTRACT_INPUTS_LIST_DEFINITION = '''
+extractInputsList[refs_List] := If[$KernelCount > 0,
+    ParallelMap[extractInputs @@ # &, refs, Method -> "FinestGrained"],
+    Map[extractInputs @@ # &, refs]
+]
+'''
+
+
+def to_input_list(result):
+    """
+    Convert a kernel result for one notebook to a list of strings.
+    
+    Args:
+        result: Value returned by the kernel for a single notebook
+        
+    Returns:
+        List of input cell contents as strings
+    """
+    if result is None or result == []:
+        return []
+    
+    # Items are normally already strings, so they are kept as-is rather
+    # than copied through str()
+    if isinstance(result, (list, tuple)):
+        return [item if isinstance(item, str) else str(item)
+                for item in result if item]
+    else:
+        return [str(result)] if result else []
+
+
+def decode_single_result(wxf):
+    """
+    Decode the kernel's WXF answer for one notebook.
+    
+    Args:
+        wxf: WXF bytes returned by extractInputs
+        
+    Returns:
+        List of input cell contents as strings
+        
+    Raises:
+        ValueError: The kernel returned something other than a list
+    """
+    result = binary_deserialize(wxf)
+    
+    # Result should be a list of strings; anything else (e.g. $Aborted)
+    # is an error rather than an input
+    if not isinstance(result, (list, tuple)):
+        raise ValueError(f"unexpected result from kernel: {result!r}")
+    
+    return to_input_list(result)
+
+
+def notebook_ref(nb_path):
+    """
+    Build the extractInputs arguments for a notebook.
+    
+    Args:
+        nb_path: Path to the .nb file
+        
+    Returns:
+        [path, mtime] where mtime is the modification time in nanoseconds,
+        or 0 if the file cannot be stat'ed
+    """
+    try:
+        mtime = os.stat(nb_path).st_mtime_ns
+    except OSError:
+        mtime = 0
+    return [str(nb_path), mtime]
+
+
+def define_extract_function(session, parallel=False):
+    """
+    Define extractInputs and extractInputsList in the session so they can be
+    applied to notebook paths.
+    
+    Args:
+        session: Active WolframLanguageSession
+        parallel: Launch subkernels so extractInputsList runs in parallel
+    """
+    session.evaluate(wlexpr(EXTRACT_INPUTS_DEFINITION))
+    session.evaluate(wlexpr(EXTRACT_INPUTS_LIST_DEFINITION))
+    if parallel:
+        session.evaluate(wlexpr(PARALLEL_SETUP))
+
+
+def submit_extract_batch(session, nb_paths):
+    """
+    Start extracting input cells from several notebooks in one evaluation.
+    
+    extractInputsList must already be defined in the session
+    (see define_extract_function). Notebooks are spread over parallel
+    subkernels when any were launched.
+    
+    Args:
+        session: Active WolframLanguageSession
+        nb_paths: Paths to the .nb files
+        
+    Returns:
+        Future for the WXF-encoded kernel result, to be passed to
+        collect_extract_batch
+    """
+    # Paths are sent as WL strings, so no escaping is needed.
+    # The result is kept as WXF bytes and decoded by collect_extract_batch.
+    return session.evaluate_wxf_future(
+        wl.extractInputsList([notebook_ref(nb_path) for nb_path in nb_paths])
+    )
+
+
+def collect_extract_batch(session, future, nb_paths):
+    """
+    Wait for a batch started by submit_extract_batch and convert its result.
+    
+    If the batch as a whole fails (e.g. one notebook aborts the kernel
+    evaluation), its notebooks are extracted again one at a time, so only
+    the notebooks that fail on their own come back empty.
+    
+    Args:
+        session: Session the batch was submitted to
+        future: Future returned by submit_extract_batch
+        nb_paths: Paths to the .nb files the batch was started with
+        
+    Returns:
+        List with one list of input strings per notebook, in the same order
+        as nb_paths
+    """
+    try:
+        result = binary_deserialize(future.result())
+        
+        if not isinstance(result, (list, tuple)) or len(result) != len(nb_paths):
+            raise ValueError(f"unexpected result from kernel: {result!r}")
+        
+        return [to_input_list(item) for item in result]
+        
+    except Exception as e:
+        print(f"Error processing batch of {len(nb_paths)} notebook(s): {e}; "
+              f"retrying them one at a time", file=sys.stderr)
+        return [extract_inputs_from_notebook(session, nb_path)
+                for nb_path in nb_paths]
+
+
+def extract_inputs_batches(session, batches):
+    """
+    Extract input cells batch by batch, keeping the kernel busy.
+    
+    The next batch is submitted before the current one is handed back, so
+    the kernel evaluates it while the caller writes or reports results.
+    
+    Args:
+        session: Active WolframLanguageSession
+        batches: Iterable of lists of .nb paths
+        
+    Yields:
+        (batch, batch_inputs) pairs, in the order of batches
+    """
+    pending = None
+    for batch in batches:
+        future = submit_extract_batch(session, batch)
+        if pending is not None:
+            yield pending[0], collect_extract_batch(session, pending[1],
+                                                    pending[0])
+        pending = (batch, future)
+    
+    if pending is not None:
+        yield pending[0], collect_extract_batch(session, pending[1],
+                                                pending[0])
+
+
+class SessionStartError(RuntimeError):
+    """A Wolfram Language session could not be started."""
+
+
+# Session of the current worker process, set by _init_worker
+_worker_session = None
+
+# Error raised while starting _worker_session, if any
+_worker_error = None
+
+# Event set by the parent to make workers skip batches not yet started
+_worker_cancel = None
+
+
+def _init_worker(cancel):
+    """Start the Wolfram Language session of a worker process."""
+    global _worker_session, _worker_error, _worker_cancel
+    
+    _worker_cancel = cancel
+    
+    # Ctrl-C is handled by the parent, which shuts the pool down cleanly;
+    # a worker interrupted mid-batch would skip nothing but its own cleanup
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    
+    # Errors are kept rather than raised: a failing Pool initializer makes
+    # the pool restart the worker forever
+    try:
+        session = WolframLanguageSession()
+        define_extract_function(session)
+    except Exception as e:
+        _worker_error = e
+        return
+    
+    _worker_session = session
+    # Finalizers with an exit priority run when the worker exits normally,
+    # including forked workers that never reach atexit handlers
+    multiprocessing.util.Finalize(None, session.terminate, exitpriority=10)
+
+
+def _extract_batch_in_worker(batch):
+    """
+    Extract a batch with the worker's session; see _init_worker.
+    
+    Returns:
+        (batch, batch_inputs, error). error is a message if the worker has
+        no session; batch_inputs is None if the batch was skipped or failed
+        that way.
+    """
+    if _worker_cancel.is_set():
+        return batch, None, None
+    
+    if _worker_session is None:
+        return batch, None, str(_worker_error)
+    
+    future = submit_extract_batch(_worker_session, batch)
+    return batch, collect_extract_batch(_worker_session, future, batch), None
+
+
+def extract_inputs_in_workers(batches, workers):
+    """
+    Extract input cells using a pool of processes with one session each.
+    
+    For when subkernel licenses are not available: every worker starts its
+    own Wolfram Language session, which only needs a main-kernel license.
+    
+    Args:
+        batches: Lists of .nb paths
+        workers: Number of worker processes
+        
+    Yields:
+        (batch, batch_inputs) pairs, in completion order
+        
+    Raises:
+        SessionStartError: A worker could not start its session; the pool
+            is shut down first
+    """
+    cancel = multiprocessing.Event()
+    pool = multiprocessing.Pool(workers, initializer=_init_worker,
+                                initargs=(cancel,))
+    try:
+        for batch, batch_inputs, error in pool.imap_unordered(
+                _extract_batch_in_worker, batches):
+            if error is not None:
+                raise SessionStartError(error)
+            yield batch, batch_inputs
+    finally:
+        # On errors, skip the batches that have not started. Never use
+        # pool.terminate(): it SIGTERMs the workers, so their finalizers
+        # would not run and their kernels would keep holding licenses.
+        cancel.set()
+        pool.close()
+        pool.join()
+
+
+def iter_batches(items, size=BATCH_SIZE):
+    """Yield lists of at most size consecutive items from an iterable."""
+    items = iter(items)
+    while batch := list(itertools.islice(items, size)):
+        yield batch
+
+
+def iter_nb_files(root):
+    """
+    Recursively yield the .nb files under root, in directory order.
+    
+    Uses os.scandir so file types come from the directory listing instead
+    of extra stat calls. Symlinked directories are not followed, and
+    directories that cannot be read are skipped.
+    
+    Args:
+        root: Directory to search
+        
+    Yields:
+        Path of each .nb file
+    """
+    try:
+        entries = os.scandir(root)
+    except OSError:
+        return
+    
+    with entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_nb_files(entry.path)
+            elif entry.name.endswith('.nb') and entry.is_file():
+                yield Path(entry.path)
 
 
 def extract_inputs_from_notebook(session, nb_path):
     """
     Extract input cells from a single notebook.
     
+    extractInputs must already be defined in the session
+    (see define_extract_function).
+    
     Args:
         session: Active WolframLanguageSession
         nb_path: Path to the .nb file
@@ -31,96 +469,231 @@ def extract_inputs_from_notebook(session, nb_path):
         List of input cell contents as strings
     """
     try:
-        # Escape the path for Wolfram Language string
-        escaped_path = str(nb_path).replace('\\', '\\\\').replace('"', '\\"')
-        
-        # Build a single Wolfram Language command that does everything
-        # This command:
-        # 1. Imports the notebook
-        # 2. Extracts input cells
-        # 3. Filters out Null and Image inputs
-        # 4. Converts them to pretty-formatted InputForm strings
-        # 5. Returns a list of strings
-        wl_code = f'''
-        Module[{{nb, cells, inputs, filtered}},
-            nb = Import["{escaped_path}", "NB"];
-            If[nb === $Failed, Return[{{}}, Module]];
-            
-            cells = Cases[nb, Cell[content_, "Input", ___] :> content, Infinity];
-            
-            (* Convert to expressions and filter out Null and Image *)
-            filtered = Select[cells,
-                Function[content,
-                    Module[{{expr}},
-                        expr = ToExpression[content, StandardForm, HoldForm];
-                        (* Check if it's not Null and doesn't contain Image *)
-                        !MatchQ[expr, HoldForm[Null]] && 
-                        FreeQ[expr, Image]
-                    ]
-                ]
-            ];
-            
-            (* Convert remaining cells to pretty-formatted InputForm strings *)
-            inputs = Map[
-                Function[content,
-                    Module[{{expr, formatted}},
-                        expr = ToExpression[content, StandardForm, HoldForm];
-                        (* Use ToString with PageWidth option for line breaks and indentation *)
-                        formatted = ToString[expr, InputForm, PageWidth -> 80];
-                        formatted
-                    ]
-                ],
-                filtered
-            ];
-            
-            inputs
-        ]
-        '''
+        # extractInputs is defined once per session, so only the call
+        # itself is sent to the kernel
+        return decode_single_result(
+            session.evaluate_wxf(wl.extractInputs(*notebook_ref(nb_path)))
+        )
         
-        # Evaluate the code and get the result
-        result = session.evaluate(wl_code)
+    except Exception as e:
+        print(f"Error processing {nb_path}: {e}", file=sys.stderr)
+        return []
+
+
+def has_input_cells(nb_path):
+    """
+    Cheaply check whether a notebook may contain Input cells.
+    
+    Notebook files spell cell styles as string literals, so a file without
+    "Input" anywhere in it has no Input cells and needs no kernel work.
+    The file is memory-mapped and searched in place rather than read into
+    a bytes object.
+    
+    Args:
+        nb_path: Path to the .nb file
         
-        # Result should be a list of strings
-        if result is None or result == []:
-            return []
+    Returns:
+        False if the notebook certainly has no Input cells. True otherwise,
+        including when the file cannot be read, so the error is reported
+        by the normal extraction path.
+    """
+    try:
+        with open(nb_path, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm.find(INPUT_STYLE_MARKER) >= 0
+    except ValueError:
+        # Empty files cannot be mapped
+        return False
+    except OSError:
+        return True
+
+
+def notebook_cache_key(nb_path):
+    """
+    Compute the cache key for a notebook from its contents.
+    
+    The key is salted with the extraction code, so results cached by an
+    older version of extractInputs are not reused.
+    
+    Args:
+        nb_path: Path to the .nb file
         
-        # Convert to Python list of strings
-        if isinstance(result, (list, tuple)):
-            return [str(item) for item in result if item]
-        else:
-            return [str(result)] if result else []
+    Returns:
+        Hex digest identifying the notebook contents
+    """
+    # Hash in chunks so large notebooks are never held in memory whole
+    digest = hashlib.blake2b(digest_size=16, salt=CACHE_SALT)
+    with open(nb_path, 'rb') as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_cached_inputs(cache_dir, key):
+    """
+    Load inputs cached under key.
+    
+    Args:
+        cache_dir: Directory holding the cache files
+        key: Cache key from notebook_cache_key
+        
+    Returns:
+        List of input strings, or None if nothing usable is cached
+    """
+    try:
+        with open(Path(cache_dir) / f"{key}.json", encoding='utf-8') as f:
+            inputs = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    if not isinstance(inputs, list):
+        return None
+    return inputs
+
+
+def store_cached_inputs(cache_dir, key, inputs):
+    """
+    Cache inputs under key.
+    
+    Args:
+        cache_dir: Directory holding the cache files
+        key: Cache key from notebook_cache_key
+        inputs: List of input strings
+    """
+    try:
+        with open(Path(cache_dir) / f"{key}.json", 'w', encoding='utf-8') as f:
+            json.dump(inputs, f, ensure_ascii=False)
+    except OSError as e:
+        print(f"Warning: Could not write cache entry {key}: {e}",
+              file=sys.stderr)
+
+
+async def aextract_inputs_from_notebook(session, nb_path):
+    """
+    Extract input cells from a single notebook without blocking the event loop.
+    
+    extractInputs must already be defined in the session
+    (see define_extract_function).
+    
+    Args:
+        session: Active WolframLanguageSession
+        nb_path: Path to the .nb file
+        
+    Returns:
+        List of input cell contents as strings
+    """
+    try:
+        future = session.evaluate_wxf_future(
+            wl.extractInputs(*notebook_ref(nb_path))
+        )
+        return decode_single_result(await asyncio.wrap_future(future))
         
     except Exception as e:
         print(f"Error processing {nb_path}: {e}", file=sys.stderr)
         return []
 
 
-def save_inputs_to_file(inputs, output_path):
+def store_object(objects_dir, inp):
+    """
+    Store an input in the content-addressed object store.
+    
+    Args:
+        objects_dir: Root directory of the object store
+        inp: Input string
+        
+    Returns:
+        SHA-256 hex digest naming the object
+    """
+    data = inp.encode('utf-8')
+    digest = hashlib.sha256(data).hexdigest()
+    
+    object_path = Path(objects_dir) / digest[:2] / f"{digest[2:]}.txt"
+    if not object_path.exists():
+        object_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        # Write under a temporary name and rename into place, so an
+        # interrupted run never leaves a truncated object that later runs
+        # would take as complete. The file is created with os.open rather
+        # than mkstemp so it gets the usual umask-based permissions instead
+        # of owner-only ones.
+        tmp_path = object_path.with_name(
+            f"{object_path.name}.{secrets.token_hex(4)}.tmp"
+        )
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, object_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+    
+    return digest
+
+
+def save_inputs_to_file(inputs, output_path, objects_dir=None):
     """
     Save extracted inputs to a text file.
     
+    The whole file is built in memory and written with a single call, so
+    inputs are not streamed: the iterable is fully consumed before anything
+    is written.
+    
     Args:
-        inputs: List of input strings
+        inputs: Iterable of input strings (e.g. a list or a generator)
         output_path: Path where to save the output
-    """
-    with open(output_path, 'w', encoding='utf-8') as f:
-        if not inputs:
-            f.write("(No input cells found)\n")
-            return
+        objects_dir: If given, each input is stored once under this directory
+            (see store_object) and the text file only lists the digests
         
-        for i, inp in enumerate(inputs, 1):
-            f.write(f"(* Input {i} *)\n")
-            f.write(f"{inp}\n\n")
-            f.write(f"{'-' * 70}\n\n")
+    Returns:
+        Number of inputs written
+    """
+    if objects_dir is None:
+        parts = [f"(* Input {i} *)\n{inp}\n\n{SEPARATOR}\n\n"
+                 for i, inp in enumerate(inputs, 1)]
+    else:
+        parts = [f"(* Input {i} -> {store_object(objects_dir, inp)} *)\n"
+                 for i, inp in enumerate(inputs, 1)]
+    
+    body = "".join(parts) if parts else "(No input cells found)\n"
+    Path(output_path).write_text(body, encoding='utf-8')
+    
+    return len(parts)
 
 
-def process_directory(input_dir, output_dir):
+def print_json(value):
+    """
+    Print value as JSON on one line of stdout.
+    
+    Uses orjson when installed, writing its UTF-8 bytes directly to the
+    stdout buffer; otherwise, or when stdout has no byte buffer (e.g. in
+    Jupyter), falls back to the json module.
+    
+    Args:
+        value: JSON-serializable value
+    """
+    buffer = getattr(sys.stdout, 'buffer', None)
+    if orjson is None or buffer is None:
+        print(json.dumps(value, ensure_ascii=False))
+        return
+    
+    # Flush pending text output so the bytes land after it
+    sys.stdout.flush()
+    buffer.write(orjson.dumps(value, option=orjson.OPT_APPEND_NEWLINE))
+    buffer.flush()
+
+
+def process_directory(input_dir, output_dir, workers=1, dedupe=False):
     """
     Recursively process all .nb files in input_dir and save to output_dir.
     
     Args:
         input_dir: Directory containing Mathematica notebooks
         output_dir: Directory where output text files will be saved
+        workers: Number of worker processes, each with its own Wolfram
+            session; 1 uses a single session in this process
+        dedupe: Store each distinct input once under output_dir/objects and
+            write per-notebook manifests instead of full text files
     """
     input_path = Path(input_dir)
     output_path = Path(output_dir)
@@ -135,65 +708,153 @@ def process_directory(input_dir, output_dir):
         print(f"Error: '{input_dir}' is not a directory", file=sys.stderr)
         sys.exit(1)
     
+    # Outputs mirror input_dir, so notebooks under a top-level directory
+    # with a reserved name would be written into the cache or object store
+    reserved = [CACHE_DIR_NAME] + ([OBJECTS_DIR_NAME] if dedupe else [])
+    for name in reserved:
+        if next(iter_nb_files(input_path / name), None) is not None:
+            print(f"Error: '{input_path / name}' contains notebooks, but "
+                  f"'{name}' is reserved in the output directory",
+                  file=sys.stderr)
+            sys.exit(1)
+    
     # Create output directory if it doesn't exist
     output_path.mkdir(parents=True, exist_ok=True)
     
-    # Find all .nb files recursively
-    nb_files = list(input_path.rglob("*.nb"))
+    cache_dir = output_path / CACHE_DIR_NAME
+    cache_dir.mkdir(exist_ok=True)
     
-    if not nb_files:
-        print(f"No .nb files found in '{input_dir}'")
-        return
-    
-    print(f"Found {len(nb_files)} notebook(s)")
+    objects_dir = output_path / OBJECTS_DIR_NAME if dedupe else None
     
-    # Start Wolfram Language session
-    print("Starting Wolfram Language session...")
-    try:
-        session = WolframLanguageSession()
-    except Exception as e:
-        print(f"Error: Could not start Wolfram Language session: {e}", 
-              file=sys.stderr)
-        print("Make sure Wolfram Engine or Mathematica is installed", 
-              file=sys.stderr)
-        sys.exit(1)
+    found = 0
+    cached = 0
+    processed = 0
+    failed = 0
+    cache_keys = {}
+    created_dirs = {output_path}
     
-    try:
-        processed = 0
-        failed = 0
+    def write_output(nb_file, inputs):
+        nonlocal processed, failed
         
-        for nb_file in nb_files:
-            # Preserve directory structure relative to input_dir
-            relative_path = nb_file.relative_to(input_path)
-            
-            # Create output filename (replace .nb with .txt)
-            output_file = output_path / relative_path.with_suffix('.txt')
-            
-            # Create subdirectories if needed
+        # Preserve directory structure relative to input_dir
+        relative_path = nb_file.relative_to(input_path)
+        print(f"Processing: {relative_path}")
+        
+        # Create output filename (replace .nb with .txt)
+        output_file = output_path / relative_path.with_suffix('.txt')
+        
+        # Create subdirectories if needed, once per directory
+        if output_file.parent not in created_dirs:
             output_file.parent.mkdir(parents=True, exist_ok=True)
+            created_dirs.add(output_file.parent)
+        
+        # Save to file
+        count = save_inputs_to_file(inputs, output_path=output_file,
+                                    objects_dir=objects_dir)
+        
+        if count:
+            print(f"  → Extracted {count} input(s) to {output_file}")
+            processed += 1
+        else:
+            print(f"  → No inputs found, created empty file at {output_file}")
+            failed += 1
+    
+    def iter_uncached():
+        # Walk the tree lazily. Notebooks already extracted in an earlier
+        # run are written straight from the cache; only the rest are yielded
+        # to be sent to the kernel.
+        nonlocal found, cached
+        for nb_file in iter_nb_files(input_path):
+            found += 1
+            if not has_input_cells(nb_file):
+                write_output(nb_file, [])
+                continue
             
-            print(f"Processing: {relative_path}")
-            
-            # Extract inputs
-            inputs = extract_inputs_from_notebook(session, nb_file)
-            
-            # Save to file
-            save_inputs_to_file(inputs, output_path=output_file)
-            
-            if inputs:
-                print(f"  → Extracted {len(inputs)} input(s) to {output_file}")
-                processed += 1
+            try:
+                key = notebook_cache_key(nb_file)
+            except OSError:
+                # Unreadable; let the kernel report it, and never cache it
+                key = None
+            inputs = None if key is None else load_cached_inputs(cache_dir, key)
+            if inputs is None:
+                cache_keys[nb_file] = key
+                yield nb_file
             else:
-                print(f"  → No inputs found, created empty file at {output_file}")
-                failed += 1
+                cached += 1
+                write_output(nb_file, inputs)
+    
+    uncached = iter_uncached()
+    first = next(uncached, None)
+    
+    def save_batch(batch, batch_inputs):
+        for nb_file, inputs in zip(batch, batch_inputs):
+            # Empty results may come from a kernel error, so only
+            # non-empty ones are cached
+            key = cache_keys.pop(nb_file)
+            if inputs and key is not None:
+                store_cached_inputs(cache_dir, key, inputs)
+            write_output(nb_file, inputs)
+    
+    if first is not None and workers > 1:
+        # The pool consumes its input from a separate thread, so finish the
+        # walk (which writes cached outputs) here before handing batches out
+        batches = list(iter_batches(itertools.chain([first], uncached)))
         
-        print(f"\nSummary: {processed} file(s) processed successfully, "
-              f"{failed} file(s) had no inputs or errors")
+        # Each session costs a kernel license and seconds of startup, so
+        # never start more than there are batches
+        pool_size = min(workers, len(batches))
         
-    finally:
-        # Always terminate the session
-        session.terminate()
-        print("Wolfram Language session terminated")
+        print(f"Starting {pool_size} Wolfram Language session(s)...")
+        try:
+            for batch, batch_inputs in extract_inputs_in_workers(batches,
+                                                                 pool_size):
+                save_batch(batch, batch_inputs)
+        except SessionStartError as e:
+            print(f"Error: Could not start Wolfram Language session: {e}", 
+                  file=sys.stderr)
+            print("Make sure Wolfram Engine or Mathematica is installed and "
+                  "licensed for this many kernels (see --workers)", 
+                  file=sys.stderr)
+            sys.exit(1)
+        print("Wolfram Language sessions terminated")
+    
+    elif first is not None:
+        # Start Wolfram Language session
+        print("Starting Wolfram Language session...")
+        try:
+            session = WolframLanguageSession()
+        except Exception as e:
+            print(f"Error: Could not start Wolfram Language session: {e}", 
+                  file=sys.stderr)
+            print("Make sure Wolfram Engine or Mathematica is installed", 
+                  file=sys.stderr)
+            sys.exit(1)
+        
+        try:
+            # Launching subkernels takes longer than extracting a single
+            # batch, so only do it once the walk has found a second one
+            batches = iter_batches(itertools.chain([first], uncached))
+            head = list(itertools.islice(batches, 2))
+            define_extract_function(session, parallel=len(head) > 1)
+            
+            # Each batch is extracted in one evaluation, while the previous
+            # batch's files are written and the walk continues here
+            for batch, batch_inputs in extract_inputs_batches(
+                    session, itertools.chain(head, batches)):
+                save_batch(batch, batch_inputs)
+            
+        finally:
+            # Always terminate the session
+            session.terminate()
+            print("Wolfram Language session terminated")
+    
+    if not found:
+        print(f"No .nb files found in '{input_dir}'")
+        return
+    
+    print(f"\nFound {found} notebook(s), {cached} taken from cache")
+    print(f"Summary: {processed} file(s) processed successfully, "
+          f"{failed} file(s) had no inputs or errors")
 
 
 def process_batch_directory(dir_path):
@@ -209,15 +870,168 @@ def process_batch_directory(dir_path):
         print(f"Error: '{dir_path}' is not a directory", file=sys.stderr)
         sys.exit(1)
 
-    nb_files = sorted(path.rglob("*.nb"))
+    nb_files = sorted(iter_nb_files(path))
 
     if not nb_files:
-        print(json.dumps({"files": [], "totalFiles": 0, "successful": 0, "failed": 0}))
+        print_json({"files": [], "totalFiles": 0, "successful": 0, "failed": 0})
         return
 
     print(f"Found {len(nb_files)} notebook(s)", file=sys.stderr)
-    print("Starting Wolfram Language session...", file=sys.stderr)
 
+    # Notebooks without any Input cell are answered without the kernel
+    to_extract = [nb_file for nb_file in nb_files if has_input_cells(nb_file)]
+    inputs_by_file = {}
+
+    if to_extract:
+        print("Starting Wolfram Language session...", file=sys.stderr)
+
+        try:
+            session = WolframLanguageSession()
+        except Exception as e:
+            print(f"Error: Could not start Wolfram Language session: {e}",
+                  file=sys.stderr)
+            sys.exit(1)
+
+        try:
+            # Launching subkernels takes longer than extracting a single
+            # batch, so only do it when there is more than one
+            define_extract_function(session,
+                                    parallel=len(to_extract) > BATCH_SIZE)
+
+            for batch, batch_inputs in extract_inputs_batches(
+                    session, iter_batches(to_extract)):
+                for nb_file, inputs in zip(batch, batch_inputs):
+                    print(f"Processing: {nb_file.relative_to(path)}",
+                          file=sys.stderr)
+                    inputs_by_file[nb_file] = inputs
+        finally:
+            session.terminate()
+
+    results = []
+    successful = 0
+    failed = 0
+
+    for nb_file in nb_files:
+        inputs = inputs_by_file.get(nb_file, [])
+        if inputs:
+            successful += 1
+        else:
+            failed += 1
+        results.append({
+            "relativePath": str(nb_file.relative_to(path)),
+            "inputs": inputs,
+            "error": None
+        })
+
+    output = {
+        "files": results,
+        "totalFiles": len(nb_files),
+        "successful": successful,
+        "failed": failed
+    }
+    print_json(output)
+
+
+class ExtractRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Handle one --serve request.
+    
+    The server first sends SERVER_GREETING. The request is then a JSON line
+    {"token": "...", "path": "..."}, where token is the server's token (see
+    server_token_path); the response is a JSON line {"inputs": [...],
+    "error": null} or {"inputs": [], "error": "..."}.
+    """
+    
+    timeout = SERVER_REQUEST_TIMEOUT
+    
+    def handle(self):
+        try:
+            self.wfile.write(SERVER_GREETING)
+            self.wfile.flush()
+            line = self.rfile.readline()
+        except OSError:
+            # Client went away or never sent its request
+            return
+        
+        try:
+            request = json.loads(line)
+            token = request["token"]
+            nb_path = Path(request["path"])
+        except (ValueError, KeyError, TypeError) as e:
+            response = {"inputs": [], "error": f"Invalid request: {e}"}
+        else:
+            if not (isinstance(token, str) and
+                    hmac.compare_digest(token, self.server.token)):
+                response = {"inputs": [], "error": "Invalid token"}
+            else:
+                inputs = extract_inputs_from_notebook(self.server.session,
+                                                      nb_path)
+                response = {"inputs": inputs, "error": None}
+        
+        try:
+            self.wfile.write(
+                json.dumps(response, ensure_ascii=False).encode('utf-8') + b"\n"
+            )
+        except OSError:
+            pass
+
+
+class ExtractServer(socketserver.TCPServer):
+    """
+    Single-threaded server answering requests with one shared session.
+    
+    Requests are handled one at a time, so the session is never used
+    concurrently. Only clients presenting the token are served.
+    """
+    
+    allow_reuse_address = True
+    
+    def __init__(self, server_address, session, token):
+        super().__init__(server_address, ExtractRequestHandler)
+        self.session = session
+        self.token = token
+
+
+def server_token_path(port):
+    """
+    Path of the file holding the token of the server on port.
+    
+    The file lives in the user's home directory and is only readable by
+    the user, so other local users cannot use the server.
+    """
+    return Path.home() / f".nbdiff-extract-{port}.token"
+
+
+def write_server_token(port, token):
+    """Write token to server_token_path(port) with owner-only permissions."""
+    path = server_token_path(port)
+    # Recreate rather than overwrite, so the permissions are always ours
+    path.unlink(missing_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(token)
+
+
+def read_server_token(port):
+    """Return the token of the server on port, or None if there is none."""
+    try:
+        return server_token_path(port).read_text(encoding='utf-8').strip()
+    except OSError:
+        return None
+
+
+def serve(port=SERVER_PORT):
+    """
+    Keep a Wolfram Language session running and answer --single requests.
+    
+    A random token is written to server_token_path(port) while the server
+    runs; requests must present it. Ctrl-C or SIGTERM stops the server and
+    cleans up.
+    
+    Args:
+        port: Local TCP port to listen on
+    """
+    print("Starting Wolfram Language session...", file=sys.stderr)
     try:
         session = WolframLanguageSession()
     except Exception as e:
@@ -225,71 +1039,166 @@ def process_batch_directory(dir_path):
               file=sys.stderr)
         sys.exit(1)
 
-    results = []
-    successful = 0
-    failed = 0
+    token = secrets.token_hex(16)
 
-    try:
-        for nb_file in nb_files:
-            relative = str(nb_file.relative_to(path))
-            print(f"Processing: {relative}", file=sys.stderr)
+    # kill (SIGTERM) is the usual way to stop a daemon; turn it into a
+    # normal exit so the token file is removed and the kernel terminated
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
 
+    try:
+        define_extract_function(session)
+        with ExtractServer((SERVER_HOST, port), session, token) as server:
+            write_server_token(port, token)
+            print(f"Listening on {SERVER_HOST}:{port}", file=sys.stderr)
             try:
-                inputs = extract_inputs_from_notebook(session, nb_file)
-                if inputs:
-                    successful += 1
-                else:
-                    failed += 1
-                results.append({
-                    "relativePath": relative,
-                    "inputs": inputs,
-                    "error": None
-                })
-            except Exception as e:
-                failed += 1
-                results.append({
-                    "relativePath": relative,
-                    "inputs": [],
-                    "error": str(e)
-                })
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                server_token_path(port).unlink(missing_ok=True)
     finally:
         session.terminate()
+        print("Wolfram Language session terminated", file=sys.stderr)
 
-    output = {
-        "files": results,
-        "totalFiles": len(nb_files),
-        "successful": successful,
-        "failed": failed
-    }
-    print(json.dumps(output, ensure_ascii=False))
 
+def request_from_server(nb_path, port=SERVER_PORT):
+    """
+    Ask a running --serve server to extract input cells from a notebook.
+    
+    Args:
+        nb_path: Path to the .nb file
+        port: Local TCP port the server listens on
+        
+    Returns:
+        List of input cell contents as strings, or None if no server answered
+        in time
+    """
+    token = read_server_token(port)
+    if token is None:
+        return None
+
+    try:
+        conn = socket.create_connection((SERVER_HOST, port),
+                                        timeout=SERVER_CONNECT_TIMEOUT)
+    except OSError:
+        return None
 
-def process_single_file(nb_path):
+    try:
+        with conn, conn.makefile('rb') as f:
+            # Anything else listening on the port, or a server that is busy
+            # or stuck, does not send the greeting within the connect timeout
+            if f.readline() != SERVER_GREETING:
+                return None
+            
+            # Extraction can take a while, but not forever
+            conn.settimeout(SERVER_RESPONSE_TIMEOUT)
+            # The server may run in another directory, so send an absolute path
+            request = {"token": token, "path": str(Path(nb_path).resolve())}
+            conn.sendall(json.dumps(request).encode('utf-8') + b"\n")
+            response = json.loads(f.readline())
+    except (OSError, ValueError) as e:
+        print(f"Warning: Extraction server did not answer: {e}",
+              file=sys.stderr)
+        return None
+
+    if not isinstance(response, dict) or response.get("error"):
+        error = response.get("error") if isinstance(response, dict) else response
+        print(f"Warning: Extraction server failed: {error}", file=sys.stderr)
+        return None
+    return response.get("inputs", [])
+
+
+async def aprocess_single_file(nb_path, port=SERVER_PORT):
     """
-    Process a single .nb file and print extracted inputs as JSON to stdout.
+    Extract input cells from a single .nb file.
+    Uses a running --serve server if there is one, otherwise starts a
+    Wolfram session for this file only.
+    
+    Blocking steps run in worker threads, so this can be awaited from an
+    existing event loop (e.g. in Jupyter).
+    
+    Args:
+        nb_path: Path to the .nb file
+        port: Local TCP port of the --serve server
+        
+    Returns:
+        List of input cell contents as strings
+        
+    Raises:
+        FileNotFoundError: nb_path does not exist
+        ValueError: nb_path is not a .nb file
+        SessionStartError: No Wolfram Language session could be started
     """
     path = Path(nb_path)
     if not path.exists():
-        print(f"Error: File '{nb_path}' does not exist", file=sys.stderr)
-        sys.exit(1)
+        raise FileNotFoundError(f"File '{nb_path}' does not exist")
     if not path.suffix == '.nb':
-        print(f"Error: '{nb_path}' is not a .nb file", file=sys.stderr)
-        sys.exit(1)
+        raise ValueError(f"'{nb_path}' is not a .nb file")
+
+    if not has_input_cells(path):
+        return []
+
+    inputs = await asyncio.to_thread(request_from_server, path, port)
+    if inputs is not None:
+        return inputs
 
     print("Starting Wolfram Language session...", file=sys.stderr)
     try:
         session = WolframLanguageSession()
     except Exception as e:
+        raise SessionStartError(str(e)) from e
+
+    try:
+        # Starts the kernel on first evaluation
+        await asyncio.to_thread(define_extract_function, session)
+        return await aextract_inputs_from_notebook(session, path)
+    finally:
+        await asyncio.to_thread(session.terminate)
+
+
+def process_single_file(nb_path, port=SERVER_PORT):
+    """
+    Process a single .nb file and print extracted inputs as JSON to stdout.
+    See aprocess_single_file.
+    """
+    try:
+        inputs = run_coroutine(aprocess_single_file(nb_path, port))
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    except SessionStartError as e:
         print(f"Error: Could not start Wolfram Language session: {e}",
               file=sys.stderr)
         sys.exit(1)
 
+    # Output JSON to stdout
+    print_json(inputs)
+
+
+def run_coroutine(coro):
+    """
+    Run a coroutine to completion and return its result.
+    
+    Works both with no event loop and from inside a running one; the latter
+    needs nest_asyncio (pip install nest_asyncio).
+    """
     try:
-        inputs = extract_inputs_from_notebook(session, path)
-        # Output JSON to stdout
-        print(json.dumps(inputs, ensure_ascii=False))
-    finally:
-        session.terminate()
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    # asyncio.run refuses to start inside a running loop, so patch the loop
+    # to be re-entrant and run the coroutine on it
+    try:
+        import nest_asyncio
+    except ImportError:
+        coro.close()
+        print("Error: Running inside an event loop requires nest_asyncio "
+              "(pip install nest_asyncio)", file=sys.stderr)
+        sys.exit(1)
+
+    nest_asyncio.apply()
+    return asyncio.get_event_loop().run_until_complete(coro)
 
 
 def main():
@@ -301,6 +1210,8 @@ Examples:
   python extract-inputs.py --single notebook.nb
   python extract-inputs.py --batch ./submissions
   python extract-inputs.py ./notebooks ./outputs
+  python extract-inputs.py --workers 4 ./notebooks ./outputs
+  python extract-inputs.py --serve
         """
     )
 
@@ -316,6 +1227,35 @@ Examples:
         help='Extract inputs from all .nb files in directory (JSON to stdout)'
     )
 
+    parser.add_argument(
+        '--serve',
+        action='store_true',
+        help='Keep a Wolfram session running and answer --single requests'
+    )
+
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=SERVER_PORT,
+        help=f'Local port used by --serve and --single (default: {SERVER_PORT})'
+    )
+
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Directory mode: extract with N processes, each running its own '
+             'Wolfram session (default: 1)'
+    )
+
+    parser.add_argument(
+        '--dedupe',
+        action='store_true',
+        help=f'Directory mode: store each distinct input once under '
+             f'OUTPUT_DIR/{OBJECTS_DIR_NAME} and write manifests of digests'
+    )
+
     parser.add_argument(
         'input_dir',
         nargs='?',
@@ -330,16 +1270,21 @@ Examples:
 
     args = parser.parse_args()
 
-    if args.single:
-        process_single_file(args.single)
+    if args.serve:
+        serve(args.port)
+    elif args.single:
+        process_single_file(args.single, args.port)
     elif args.batch:
         process_batch_directory(args.batch)
     elif args.input_dir and args.output_dir:
-        process_directory(args.input_dir, args.output_dir)
+        process_directory(args.input_dir, args.output_dir, args.workers,
+                          args.dedupe)
     else:
         parser.print_help()
         sys.exit(1)
 
 
 if __name__ == "__main__":
+    # Needed for --workers in the PyInstaller-built sidecar
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file